@@ -1,14 +1,35 @@
 import asyncio
-from playwright.async_api import async_playwright
-import ollama
-import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from backends import load
+from session import AnalysisSession
+from models import AuthComponent
+from prompts import PromptBuilder, log_usage
+
+# Selector path from the nearest ancestor with an id, computed in the page
+CSS_PATH_JS = """el => {
+    const parts = [];
+    for (let node = el; node && node.nodeType === 1; node = node.parentElement) {
+        const tag = node.tagName.toLowerCase();
+        if (node.id) { parts.unshift(`${tag}#${node.id}`); break; }
+        const parent = node.parentElement;
+        const siblings = parent ? Array.from(parent.children).filter(c => c.tagName === node.tagName) : [];
+        parts.unshift(siblings.length > 1 ? `${tag}:nth-of-type(${siblings.indexOf(node) + 1})` : tag);
+    }
+    return parts.join(' > ');
+}"""
+
+def _chat(prompt: str):
+    """Blocking Ollama call; the coroutines run it in a worker thread"""
+    return load('ollama').chat(model='llama3.2:latest', messages=[{
+        'role': 'user',
+        'content': prompt
+    }])
 
 class AgenticAuthDetector:
     def __init__(self):
         pass
         
-    async def detect_with_agents(self, url: str, static_components: List[Dict]) -> Dict[str, Any]:
+    async def detect_with_agents(self, url: str, static_components: List[AuthComponent], session: Optional[AnalysisSession] = None) -> Dict[str, Any]:
         """Orchestrate detection using multiple agents"""
         
         # If static detection found components, enhance with validation
@@ -16,22 +37,22 @@ class AgenticAuthDetector:
             return await self._enhance_static_results(url, static_components)
         
         # If static failed, use dynamic agents
-        return await self._dynamic_detection_flow(url)
+        return await self._dynamic_detection_flow(url, session)
     
-    async def _enhance_static_results(self, url: str, components: List[Dict]) -> Dict[str, Any]:
+    async def _enhance_static_results(self, url: str, components: List[AuthComponent]) -> Dict[str, Any]:
         """Enhance static results with AI validation"""
         try:
-            validation_prompt = f"""
-            Analyze these detected auth components from {url}:
-            {json.dumps(components, indent=2)}
-            
-            Are these likely functional login forms? Rate confidence 1-10 and explain briefly.
-            """
+            validation_prompt = PromptBuilder().components(components).build(
+                f"""
+                The components above were detected as auth components on {url}.
+                
+                Are these likely functional login forms? Rate confidence 1-10 and explain briefly.
+                """,
+                label="validate_static"
+            )
             
-            response = ollama.chat(model='llama3.2:latest', messages=[{
-                'role': 'user', 
-                'content': validation_prompt
-            }])
+            response = await asyncio.to_thread(_chat, validation_prompt)
+            log_usage("validate_static", response)
             
             return {
                 'components': components,
@@ -46,29 +67,42 @@ class AgenticAuthDetector:
                 'method': 'static_only'
             }
     
-    async def _dynamic_detection_flow(self, url: str) -> Dict[str, Any]:
+    async def _dynamic_detection_flow(self, url: str, session: Optional[AnalysisSession] = None) -> Dict[str, Any]:
         """Dynamic detection flow for failed static detection"""
         all_components = []
         
+        # Reuse the already-rendered page from static detection when possible
+        page = await session.attach_page() if session else None
+        
         try:
-            playwright = await async_playwright().start()
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-            )
-            
-            # Try dynamic interaction
-            dynamic_components = await self._dynamic_detect(context, url)
-            all_components.extend(dynamic_components)
-            
-            # Try navigation if dynamic failed
-            if not dynamic_components:
-                nav_components = await self._navigate_to_auth(context, url)
-                all_components.extend(nav_components)
-            
-            await context.close()
-            await browser.close()
-            await playwright.stop()
+            if page:
+                dynamic_components = await self._dynamic_detect(page, url, loaded=True)
+                all_components.extend(dynamic_components)
+                
+                if not dynamic_components:
+                    nav_components = await self._navigate_to_auth(page, url)
+                    all_components.extend(nav_components)
+            else:
+                playwright_api = await asyncio.to_thread(load, 'playwright.async_api')
+                playwright = await playwright_api.async_playwright().start()
+                browser = await playwright.chromium.launch(headless=True)
+                context = await browser.new_context(
+                    user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+                )
+                page = await context.new_page()
+                
+                # Try dynamic interaction
+                dynamic_components = await self._dynamic_detect(page, url)
+                all_components.extend(dynamic_components)
+                
+                # Try navigation if dynamic failed
+                if not dynamic_components:
+                    nav_components = await self._navigate_to_auth(page, url)
+                    all_components.extend(nav_components)
+                
+                await context.close()
+                await browser.close()
+                await playwright.stop()
             
         except Exception as e:
             print(f"Dynamic detection error: {e}")
@@ -76,17 +110,17 @@ class AgenticAuthDetector:
         # AI analysis of dynamic results
         if all_components:
             try:
-                analysis_prompt = f"""
-                Analyze these dynamically detected auth components from {url}:
-                {json.dumps(all_components, indent=2)}
-                
-                Summarize the authentication method and key findings.
-                """
+                analysis_prompt = PromptBuilder().components(all_components).build(
+                    f"""
+                    The components above were detected dynamically on {url}.
+                    
+                    Summarize the authentication method and key findings.
+                    """,
+                    label="analyze_dynamic"
+                )
                 
-                response = ollama.chat(model='llama3.2:latest', messages=[{
-                    'role': 'user',
-                    'content': analysis_prompt
-                }])
+                response = await asyncio.to_thread(_chat, analysis_prompt)
+                log_usage("analyze_dynamic", response)
                 
                 return {
                     'components': all_components,
@@ -107,13 +141,19 @@ class AgenticAuthDetector:
             'method': 'dynamic_failed'
         }
 
-    async def _dynamic_detect(self, context, url: str) -> List[Dict[str, Any]]:
-        """Dynamic detection using browser automation"""
+    async def _component_from_locator(self, locator, component_type: str, method: str, url: Optional[str] = None) -> AuthComponent:
+        """Capture a compact component record from a live element"""
+        html = await locator.evaluate('el => el.outerHTML')
+        path = await locator.evaluate(CSS_PATH_JS)
+        return AuthComponent.from_html(html, component_type, method, css_path=path, url=url)
+
+    async def _dynamic_detect(self, page, url: str, loaded: bool = False) -> List[AuthComponent]:
+        """Dynamic detection using browser automation, starting from the page as-is when already loaded"""
         components = []
         
         try:
-            page = await context.new_page()
-            await page.goto(url, wait_until='networkidle', timeout=15000)
+            if not loaded:
+                await page.goto(url, wait_until='networkidle', timeout=15000)
             
             # Strategy 1: Look for auth-related buttons/links to click
             auth_selectors = [
@@ -136,11 +176,9 @@ class AgenticAuthDetector:
                         for form in forms:
                             html = await form.inner_html()
                             if any(keyword in html.lower() for keyword in ['password', 'email', 'username']):
-                                components.append({
-                                    'type': 'dynamic_auth_form',
-                                    'html': html[:500] + "...",
-                                    'method': 'dynamic_interaction'
-                                })
+                                components.append(
+                                    await self._component_from_locator(form, 'dynamic_auth_form', 'dynamic_interaction')
+                                )
                                 break
                         
                         if components:
@@ -151,21 +189,17 @@ class AgenticAuthDetector:
                 except Exception:
                     continue
             
-            await page.close()
-            
         except Exception as e:
             print(f"Dynamic detect error: {e}")
             
         return components
 
-    async def _navigate_to_auth(self, context, url: str) -> List[Dict[str, Any]]:
+    async def _navigate_to_auth(self, page, url: str) -> List[AuthComponent]:
         """Navigate to likely auth pages"""
         components = []
         auth_paths = ['/login', '/signin', '/sign-in', '/auth', '/account/login']
         
         try:
-            page = await context.new_page()
-            
             for path in auth_paths:
                 try:
                     auth_url = url.rstrip('/') + path
@@ -175,19 +209,15 @@ class AgenticAuthDetector:
                         # Check if this page has auth forms
                         forms = await page.locator('form, input[type="password"]').all()
                         if forms:
-                            html = await page.content()
-                            components.append({
-                                'type': 'navigated_auth_page',
-                                'html': html[:1000] + "...",
-                                'method': 'path_navigation',
-                                'url': auth_url
-                            })
+                            form = forms[0].locator('xpath=ancestor-or-self::form[1]')
+                            target = form if await form.count() else forms[0]
+                            components.append(
+                                await self._component_from_locator(target, 'navigated_auth_page', 'path_navigation', url=auth_url)
+                            )
                             break
                             
                 except Exception:
                     continue
-                    
-            await page.close()
             
         except Exception as e:
             print(f"Navigation error: {e}")
@@ -0,0 +1,73 @@
+import importlib
+import threading
+import time
+from typing import Dict, List
+
+# Heavy third-party backends, imported on first use instead of at startup.
+# /analyze cannot run without the required ones; the optional ones only
+# degrade it (no LLM text, no agent stages, no plain-HTTP fallback).
+REQUIRED_MODULES = [
+    'bs4',
+    'selenium.webdriver.common.by',
+    'selenium.webdriver.support.ui',
+    'selenium.webdriver.support.expected_conditions',
+    'undetected_chromedriver',
+]
+OPTIONAL_MODULES = [
+    'requests',
+    'ollama',
+    'playwright.async_api',
+]
+HEAVY_MODULES = REQUIRED_MODULES + OPTIONAL_MODULES
+
+_modules = {}
+_import_ms: Dict[str, float] = {}
+_failed: Dict[str, str] = {}
+# One lock per module, so a slow import never blocks loading a different one
+_locks: Dict[str, threading.Lock] = {}
+
+
+def load(name: str):
+    """Import a backend module once, recording how long the import took"""
+    module = _modules.get(name)
+    if module is not None:
+        return module
+
+    with _locks.setdefault(name, threading.Lock()):
+        module = _modules.get(name)
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            _import_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+            _modules[name] = module
+            _failed.pop(name, None)
+            print(f"📦 Loaded {name} in {_import_ms[name]} ms")
+    return module
+
+
+def warm(names: List[str] = HEAVY_MODULES):
+    """Import every backend up front; failures are recorded, not raised"""
+    for name in names:
+        try:
+            load(name)
+        except Exception as e:
+            _failed[name] = str(e)
+            print(f"⚠️  Could not pre-load {name}: {e}")
+
+
+def is_warm(names: List[str] = REQUIRED_MODULES) -> bool:
+    """True once every required backend is imported"""
+    return all(name in _modules for name in names)
+
+
+def status() -> Dict[str, object]:
+    return {
+        'loaded': sorted(_modules),
+        'pending': [name for name in HEAVY_MODULES if name not in _modules and name not in _failed],
+        'failed': {
+            'required': {name: err for name, err in _failed.items() if name in REQUIRED_MODULES},
+            'optional': {name: err for name, err in _failed.items() if name in OPTIONAL_MODULES},
+        },
+        'degraded': any(name in _failed for name in OPTIONAL_MODULES),
+        'import_ms': dict(_import_ms),
+    }
@@ -1,13 +1,44 @@
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+import math
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
-from scraper import AuthDetector
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, field_serializer
+from typing import Any, List, Optional
+from scraper import AuthDetector, BOT_PROTECTION_MESSAGE
 from agent import AgenticAuthDetector
+from session import AnalysisSession
+from scheduler import DomainScheduler, domain_of, BLOCK_CAPTCHA
+from models import AuthComponent
+import backends
 import logging
 import uvicorn
 
-app = FastAPI(title="Auth Component Detector API")
+startup_metrics = {
+    "import_ms": round((time.perf_counter() - _import_started) * 1000, 1),
+    "warmup_ms": None,
+}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-load the browser/LLM backends off the event loop so the worker can
+    # answer health checks immediately and report ready once they are warm
+    async def warm_backends():
+        start = time.perf_counter()
+        await asyncio.to_thread(backends.warm)
+        startup_metrics["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(f"🔥 Backend warm-up finished in {startup_metrics['warmup_ms']} ms")
+
+    warmup = asyncio.create_task(warm_backends())
+    yield
+    if not warmup.done():
+        warmup.cancel()
+
+app = FastAPI(title="Auth Component Detector API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +49,7 @@ app.add_middleware(
 )
 
 detector = AuthDetector()
+scheduler = DomainScheduler()
 
 class URLRequest(BaseModel):
     url: str
@@ -26,64 +58,152 @@ class URLRequest(BaseModel):
 class AuthResponse(BaseModel):
     url: str
     found: bool
-    components: list
+    components: List[Any]
     ai_analysis: str
     method: str = "static"
     captcha_detected: bool = False
     error: Optional[str] = None
 
+    @field_serializer('components')
+    def serialize_components(self, components: List[Any]):
+        return [c.to_dict() if isinstance(c, AuthComponent) else c for c in components]
+
 @app.get("/")
 async def root():
     return {"message": "Auth Component Detector API with Agentic Enhancement"}
 
-@app.post("/analyze")
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: every required backend is imported; optional failures only mark it degraded"""
+    ready = backends.is_warm()
+    status = backends.status()
+    if ready:
+        reason = None
+    elif status["failed"]["required"]:
+        reason = "required backend failed to import: " + ", ".join(status["failed"]["required"])
+    else:
+        reason = "warming up"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "reason": reason, **startup_metrics, "backends": status}
+    )
+
+@app.get("/domains")
+async def domain_stats():
+    """Recent outcomes, rate-limit tokens and backoff per analyzed domain"""
+    return scheduler.stats()
+
+def backoff_response(url: str, blocked_for: float) -> AuthResponse:
+    """Answer for a domain inside its backoff window, without starting a browser"""
+    retry_note = f"_Cached result: retry after {blocked_for:.0f}s._"
+    if scheduler.block_reason(url) == BLOCK_CAPTCHA:
+        return AuthResponse(
+            url=url,
+            found=False,
+            components=[],
+            ai_analysis=f"{BOT_PROTECTION_MESSAGE}\n\n{retry_note}",
+            method="blocked_backoff",
+            captcha_detected=True,
+            error=None
+        )
+    return AuthResponse(
+        url=url,
+        found=False,
+        components=[],
+        ai_analysis=f"Recent attempts to load {domain_of(url)} failed repeatedly.\n\n{retry_note}",
+        method="blocked_backoff",
+        captcha_detected=False,
+        error=f"{domain_of(url)} failed to load on recent attempts; retry after {blocked_for:.0f}s"
+    )
+
+@app.post("/analyze", response_model=AuthResponse)
 async def analyze_url(request: URLRequest):
+    # Answer domains that recently blocked us without starting a browser
+    blocked_for = scheduler.blocked_for(request.url)
+    if blocked_for:
+        print(f"🚫 Skipping {domain_of(request.url)}: in backoff for {blocked_for:.0f}s")
+        return backoff_response(request.url, blocked_for)
+    
+    if not await scheduler.acquire(request.url):
+        retry_after = max(1, math.ceil(scheduler.retry_after(request.url)))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many requests for {domain_of(request.url)}, retry after {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    # The domain may have entered backoff while this request waited for a token
+    blocked_for = scheduler.blocked_for(request.url)
+    if blocked_for:
+        return backoff_response(request.url, blocked_for)
+    
+    # One live browser page carried through static detection and the agent stages
+    session = AnalysisSession(request.url)
     try:
         # Use undetected-chromedriver for all requests (visible browser)
-        static_result = detector.detect_auth_components(request.url, use_chromedriver=True)
+        # Chrome launch, page wait and the static LLM call all block, so run them
+        # in a worker thread to keep /healthz and /readyz responsive
+        static_result = await asyncio.to_thread(
+            detector.detect_auth_components, request.url, use_chromedriver=True, session=session
+        )
+        scheduler.record(
+            request.url,
+            captcha_detected=static_result.get('captcha_detected', False),
+            navigation_failed=static_result.get('navigation_failed', False),
+            latency=static_result.get('page_load_seconds')
+        )
         
-        # Log HTML snippet length for debugging
+        # Log component inventory for debugging
         if static_result.get('components'):
             for i, comp in enumerate(static_result['components']):
-                html_len = len(comp.get('html', ''))
-                print(f"📏 Component {i+1}: HTML length = {html_len} characters")
+                print(f"📏 Component {i+1}: {comp.type} via {', '.join(comp.strategies)} "
+                      f"({len(comp.fields)} fields, {len(comp.buttons)} buttons)")
         
-        if request.use_agents:
+        # Don't spend more browser time on a page that is walled off or unreachable
+        walled_off = static_result.get('captcha_detected') or static_result.get('navigation_failed')
+        if request.use_agents and not walled_off:
             # Use agentic approach
             agent_detector = AgenticAuthDetector()
-            result = await agent_detector.detect_with_agents(request.url, static_result['components'])
+            result = await agent_detector.detect_with_agents(request.url, static_result['components'], session=session)
             
-            return {
-                "url": request.url,
-                "found": len(result['components']) > 0,
-                "components": result['components'],
-                "ai_analysis": result.get('ai_analysis', ''),
-                "method": result['method'],
-                "captcha_detected": static_result.get('captcha_detected', False),
-                "error": None
-            }
+            return AuthResponse(
+                url=request.url,
+                found=len(result['components']) > 0,
+                components=result['components'],
+                ai_analysis=result.get('ai_analysis', ''),
+                method=result['method'],
+                captcha_detected=static_result.get('captcha_detected', False),
+                error=None
+            )
         else:
             # Return static results
-            return {
-                "url": static_result['url'],
-                "found": static_result['found'],
-                "components": static_result['components'],
-                "ai_analysis": static_result['ai_analysis'],
-                "method": "chromedriver",
-                "captcha_detected": static_result.get('captcha_detected', False),
-                "error": static_result.get('error')
-            }
+            return AuthResponse(
+                url=static_result['url'],
+                found=static_result['found'],
+                components=static_result['components'],
+                ai_analysis=static_result['ai_analysis'],
+                method="chromedriver",
+                captcha_detected=static_result.get('captcha_detected', False),
+                error=static_result.get('error')
+            )
             
     except Exception as e:
         logging.error(f"Error analyzing {request.url}: {str(e)}")
-        return {
-            "url": request.url,
-            "found": False,
-            "components": [],
-            "ai_analysis": "",
-            "method": "error",
-            "error": str(e)
-        }
+        return AuthResponse(
+            url=request.url,
+            found=False,
+            components=[],
+            ai_analysis="",
+            method="error",
+            error=str(e)
+        )
+    finally:
+        await session.aclose()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,191 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from backends import load
+
+HTML_EXCERPT_CHARS = 500
+MAX_FIELDS = 20
+MAX_BUTTONS = 10
+MAX_LABEL_CHARS = 40
+
+FIELD_TAGS = ['input', 'select', 'textarea']
+BUTTON_INPUT_TYPES = {'submit', 'button', 'image'}
+
+@dataclass
+class AuthComponent:
+    """
+    Compact record of one detected auth component.
+
+    Holds the field inventory and button labels instead of the raw HTML. Only
+    a short HTML excerpt is kept, so no reference to the parsed DOM survives
+    detection.
+    """
+    type: str
+    strategies: List[str] = field(default_factory=list)
+    css_path: str = ''
+    fields: List[Dict[str, str]] = field(default_factory=list)
+    buttons: List[str] = field(default_factory=list)
+    url: Optional[str] = None
+    _html: str = field(default='', init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_element(cls, element, type: str, strategy: str, url: Optional[str] = None) -> 'AuthComponent':
+        """Build a component from a BeautifulSoup element"""
+        component = cls(
+            type=type,
+            strategies=[strategy],
+            css_path=css_path(element),
+            fields=field_inventory(element),
+            buttons=button_labels(element),
+            url=url,
+        )
+        component._html = element_excerpt(element)
+        return component
+
+    @classmethod
+    def from_html(cls, html: str, type: str, strategy: str, css_path: str = '', url: Optional[str] = None) -> 'AuthComponent':
+        """Build a component from an HTML fragment captured in a live browser"""
+        fragment = load('bs4').BeautifulSoup(html, 'html.parser')
+        component = cls(
+            type=type,
+            strategies=[strategy],
+            css_path=css_path,
+            fields=field_inventory(fragment),
+            buttons=button_labels(fragment),
+            url=url,
+        )
+        component._html = html_excerpt(html)
+        return component
+
+    @property
+    def method(self) -> str:
+        return self.strategies[0] if self.strategies else ''
+
+    @property
+    def html(self) -> str:
+        """Truncated HTML excerpt captured at detection time"""
+        return self._html
+
+    def add_strategy(self, strategy: str):
+        if strategy not in self.strategies:
+            self.strategies.append(strategy)
+
+    def inventory(self) -> Dict[str, Any]:
+        """Compact description for LLM prompts (no HTML)"""
+        summary = {
+            'type': self.type,
+            'strategies': self.strategies,
+            'css_path': self.css_path,
+            'fields': self.fields,
+            'buttons': self.buttons,
+        }
+        if self.url:
+            summary['url'] = self.url
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self.inventory()
+        data['method'] = self.method
+        data['html'] = self.html
+        return data
+
+
+def html_excerpt(raw: str) -> str:
+    return raw[:HTML_EXCERPT_CHARS] + "..." if len(raw) > HTML_EXCERPT_CHARS else raw
+
+
+def element_excerpt(element, limit: int = HTML_EXCERPT_CHARS) -> str:
+    """Serialize a bs4 element only until the excerpt is full, instead of str(element)[:limit]"""
+    chunks = []
+    size = 0
+    for chunk in _html_chunks(element):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            break
+    return html_excerpt(''.join(chunks))
+
+
+def _attr(key, value) -> str:
+    """Render one attribute the way bs4's default (minimal) formatter does"""
+    entities = load('bs4').dammit.EntitySubstitution
+    if isinstance(value, (list, tuple)):
+        value = ' '.join(value)
+    return f' {key}={entities.quoted_attribute_value(entities.substitute_xml(str(value)))}'
+
+
+def _html_chunks(element):
+    """Yield the element's markup piece by piece, depth first"""
+    stack = [(element, False)]
+    while stack:
+        node, closing = stack.pop()
+        if closing:
+            yield f"</{node.name}>"
+            continue
+        if node.name is None:
+            # Text, comments, CDATA etc. render themselves
+            yield node.output_ready()
+            continue
+        attrs = ''.join(_attr(key, value) for key, value in sorted(node.attrs.items()))
+        if node.is_empty_element:
+            yield f"<{node.name}{attrs}/>"
+            continue
+        yield f"<{node.name}{attrs}>"
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(node.contents))
+
+
+def css_path(element) -> str:
+    """CSS selector path from the nearest ancestor with an id down to the element"""
+    parts = []
+    node = element
+    while node is not None and node.name and node.name != '[document]':
+        if node.get('id'):
+            parts.append(f"{node.name}#{node['id']}")
+            break
+        part = node.name
+        if node.parent is not None:
+            siblings = node.parent.find_all(node.name, recursive=False)
+            if len(siblings) > 1:
+                index = next(i for i, sibling in enumerate(siblings, 1) if sibling is node)
+                part += f":nth-of-type({index})"
+        parts.append(part)
+        node = node.parent
+    return ' > '.join(reversed(parts))
+
+
+def field_inventory(element) -> List[Dict[str, str]]:
+    """Names, types and autocomplete hints of the visible form fields"""
+    fields = []
+    for field_elem in element.find_all(FIELD_TAGS):
+        default_type = 'text' if field_elem.name == 'input' else field_elem.name
+        field_type = (field_elem.get('type') or default_type).lower()
+        if field_type == 'hidden' or field_type in BUTTON_INPUT_TYPES:
+            continue
+        entry = {'type': field_type}
+        for attr in ('name', 'autocomplete'):
+            if field_elem.get(attr):
+                entry[attr] = field_elem.get(attr)
+        fields.append(entry)
+        if len(fields) >= MAX_FIELDS:
+            break
+    return fields
+
+
+def button_labels(element) -> List[str]:
+    """Visible labels of buttons and submit inputs"""
+    labels = []
+    for button in element.find_all(True):
+        if button.name == 'input':
+            if (button.get('type') or '').lower() not in BUTTON_INPUT_TYPES:
+                continue
+            label = button.get('value') or button.get('aria-label') or ''
+        elif button.name == 'button' or button.get('role') == 'button':
+            label = button.get_text(' ', strip=True) or button.get('aria-label') or ''
+        else:
+            continue
+        label = label[:MAX_LABEL_CHARS]
+        if label and label not in labels:
+            labels.append(label)
+            if len(labels) >= MAX_BUTTONS:
+                break
+    return labels
@@ -0,0 +1,211 @@
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List
+from backends import load
+from models import field_inventory, button_labels
+
+# Rough budget for the page/component context handed to llama3.2;
+# override with the PROMPT_TOKEN_BUDGET environment variable
+DEFAULT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 800))
+CHARS_PER_TOKEN = 4
+MAX_TEXT_CHARS = 80
+
+NON_CONTENT_TAGS = {'script', 'style', 'svg', 'noscript', 'template'}
+
+AUTH_BUTTON_PATTERN = re.compile(r'sign\s*in|log\s*in|login|sign\s*up|register|continue|next|forgot', re.I)
+OAUTH_PATTERN = re.compile(
+    r'oauth|openid|saml|\bsso\b|single sign|sign in with|log in with|continue with|'
+    r'accounts\.google|facebook\.com/.*(dialog|login)|appleid\.apple|github\.com/login/oauth|'
+    r'login\.microsoftonline|okta|auth0',
+    re.I
+)
+CAPTCHA_MARKERS = {
+    'recaptcha': re.compile(r'recaptcha', re.I),
+    'hcaptcha': re.compile(r'hcaptcha', re.I),
+    'turnstile': re.compile(r'cf-turnstile|challenges\.cloudflare', re.I),
+    'arkose': re.compile(r'arkoselabs|funcaptcha', re.I),
+    'captcha': re.compile(r'captcha', re.I),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def visible_text(element) -> str:
+    """Text of an element, ignoring comments and script/style/svg content"""
+    # Comments, CDATA, doctypes etc. are never rendered text
+    hidden_strings = load('bs4').element.PreformattedString
+    parts = []
+    for text in element.find_all(string=True):
+        if isinstance(text, hidden_strings):
+            continue
+        node = text.parent
+        while node is not None and node is not element.parent and node.name not in NON_CONTENT_TAGS:
+            node = node.parent
+        if (node is None or node is element.parent) and text.strip():
+            parts.append(text.strip())
+    return ' '.join(parts)[:MAX_TEXT_CHARS]
+
+
+class PromptBuilder:
+    """
+    Packs auth-relevant sections into a prompt within a token budget.
+
+    Sections are added in priority order; once the budget is spent, the
+    remaining lines are dropped and the prompt notes the truncation.
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.sections: List[tuple] = []
+
+    def section(self, title: str, lines: Iterable[str]) -> 'PromptBuilder':
+        lines = [line for line in lines if line]
+        if lines:
+            self.sections.append((title, lines))
+        return self
+
+    def page_signals(self, soup) -> 'PromptBuilder':
+        """Add title, forms, OAuth/SSO links, labels, buttons and CAPTCHA markers from a page"""
+        title = soup.find('title')
+        if title and title.get_text(strip=True):
+            self.section("Page title", [title.get_text(strip=True)[:MAX_TEXT_CHARS]])
+        self.section("CAPTCHA markers", _captcha_markers(soup))
+        self.section("Forms", _form_lines(soup))
+        self.section("OAuth/SSO links", _oauth_lines(soup))
+        self.section("Field labels", _label_lines(soup))
+        self.section("Auth buttons", _button_lines(soup))
+        return self
+
+    def components(self, components) -> 'PromptBuilder':
+        """Add one compact JSON line per detected component"""
+        return self.section(
+            "Detected components",
+            [json.dumps(c.inventory(), separators=(',', ':')) for c in components]
+        )
+
+    def build(self, instructions: str, label: str = "prompt") -> str:
+        budget = self.token_budget
+        used = 0
+        dropped = 0
+        blocks = []
+
+        for title, lines in self.sections:
+            kept = []
+            for line in lines:
+                cost = estimate_tokens(line) + 1
+                if used + cost > budget:
+                    dropped += 1
+                    continue
+                kept.append(f"- {line}")
+                used += cost
+            if kept:
+                blocks.append(f"{title}:\n" + '\n'.join(kept))
+
+        context = '\n\n'.join(blocks) if blocks else "No auth-related elements extracted."
+        if dropped:
+            context += f"\n\n({dropped} lower-priority items omitted to fit the token budget)"
+
+        prompt = f"{context}\n\n{instructions.strip()}"
+        print(f"🧮 {label}: ~{estimate_tokens(prompt)} input tokens "
+              f"(context {used}/{budget}, {dropped} items dropped)")
+        return prompt
+
+
+def log_usage(label: str, response) -> None:
+    """Print the token counts Ollama reports for a chat response"""
+    try:
+        prompt_tokens = response.get('prompt_eval_count')
+        output_tokens = response.get('eval_count')
+    except Exception:
+        return
+    if prompt_tokens is not None:
+        print(f"🧮 {label}: {prompt_tokens} prompt tokens, {output_tokens} output tokens (Ollama)")
+
+
+def _format_field(entry: Dict[str, Any]) -> str:
+    details = ', '.join(f"{key}={entry[key]}" for key in ('name', 'autocomplete') if key in entry)
+    return f"{entry['type']}({details})" if details else entry['type']
+
+
+def _form_lines(soup) -> List[str]:
+    lines = []
+    containers = soup.find_all('form')
+
+    # Inputs rendered outside any <form> (common in JS apps)
+    orphan_inputs = [
+        inp for inp in soup.find_all('input', {'type': re.compile(r'password|email', re.I)})
+        if not inp.find_parent('form')
+    ]
+    for inp in orphan_inputs:
+        parent = inp.find_parent(['div', 'section', 'main'])
+        if parent and all(parent is not c for c in containers):
+            containers.append(parent)
+
+    for container in containers:
+        fields = field_inventory(container)
+        if not fields:
+            continue
+        header = container.name
+        if container.name == 'form':
+            attrs = ' '.join(f"{key}={container.get(key)}" for key in ('action', 'method') if container.get(key))
+            header = f"form {attrs}".strip()
+        line = f"{header}: fields [{', '.join(_format_field(f) for f in fields)}]"
+        buttons = button_labels(container)
+        if buttons:
+            line += f"; buttons [{', '.join(buttons)}]"
+        lines.append(line)
+    return lines
+
+
+def _oauth_lines(soup) -> List[str]:
+    lines = []
+    for element in soup.find_all(['a', 'button']):
+        href = element.get('href') or ''
+        text = visible_text(element) or element.get('aria-label') or ''
+        if OAUTH_PATTERN.search(href) or OAUTH_PATTERN.search(text):
+            line = f"{text} -> {href[:MAX_TEXT_CHARS]}" if href else text
+            if line and line not in lines:
+                lines.append(line)
+    return lines
+
+
+def _label_lines(soup) -> List[str]:
+    labels = []
+    for label in soup.find_all('label'):
+        text = visible_text(label)
+        if text and text not in labels:
+            labels.append(text)
+    for inp in soup.find_all('input'):
+        text = inp.get('placeholder') or inp.get('aria-label')
+        if text and text[:MAX_TEXT_CHARS] not in labels:
+            labels.append(text[:MAX_TEXT_CHARS])
+    return labels
+
+
+def _button_lines(soup) -> List[str]:
+    buttons = []
+    for element in soup.find_all(['button', 'a', 'input']):
+        if element.name == 'input':
+            text = element.get('value') if (element.get('type') or '').lower() == 'submit' else None
+        else:
+            text = visible_text(element)
+        if text and AUTH_BUTTON_PATTERN.search(text) and text not in buttons:
+            buttons.append(text)
+    return buttons
+
+
+def _captcha_markers(soup) -> List[str]:
+    found = []
+    haystacks = [el.get('src', '') for el in soup.find_all(['iframe', 'script'], src=True)]
+    haystacks += [' '.join(el.get('class', [])) for el in soup.find_all(class_=True)]
+    haystacks += [el.get('id', '') for el in soup.find_all(id=True)]
+    for name, pattern in CAPTCHA_MARKERS.items():
+        if any(pattern.search(value) for value in haystacks if value):
+            found.append(name)
+    # The generic marker only adds information when no specific provider matched
+    if len(found) > 1 and 'captcha' in found:
+        found.remove('captcha')
+    return found
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+from urllib.parse import urlparse
+
+RATE_PER_MINUTE = 6
+BURST = 3
+BASE_BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 3600
+FAILURE_STRIKE_THRESHOLD = 2
+HISTORY_SIZE = 20
+# Idle domains are only swept once this many are tracked
+PRUNE_THRESHOLD = 256
+
+BLOCK_CAPTCHA = 'captcha'
+BLOCK_NAVIGATION = 'navigation'
+
+
+def domain_of(url: str) -> str:
+    host = (urlparse(url).hostname or url).lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+@dataclass
+class DomainState:
+    """Token bucket, backoff window and recent outcomes for one domain"""
+    tokens: float
+    refilled_at: float
+    last_seen: float
+    strikes: int = 0
+    consecutive_failures: int = 0
+    blocked_until: float = 0.0
+    block_reason: Optional[str] = None
+    outcomes: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=HISTORY_SIZE))
+
+
+class DomainScheduler:
+    """
+    Per-domain rate limiting with exponential backoff for bot-protected sites.
+
+    Each domain gets a token bucket. A CAPTCHA/anti-bot wall, or repeated
+    navigation failures caused by the site, opens a backoff window that
+    doubles with every further block; requests inside the window are
+    answered without a browser. A clean result resets the backoff.
+    """
+
+    def __init__(self, rate_per_minute: float = RATE_PER_MINUTE, burst: int = BURST,
+                 base_backoff: float = BASE_BACKOFF_SECONDS, max_backoff: float = MAX_BACKOFF_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._domains: Dict[str, DomainState] = {}
+
+    def _state(self, url: str) -> DomainState:
+        domain = domain_of(url)
+        state = self._domains.get(domain)
+        if state is None:
+            if len(self._domains) >= PRUNE_THRESHOLD:
+                self._prune()
+            now = self.clock()
+            state = self._domains[domain] = DomainState(tokens=self.burst, refilled_at=now, last_seen=now)
+        return state
+
+    def _refill(self, state: DomainState, now: float):
+        state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * self.rate)
+        state.refilled_at = now
+
+    def _prune(self):
+        """Forget domains with a full bucket, no active backoff and no strikes worth remembering"""
+        now = self.clock()
+        for domain, state in list(self._domains.items()):
+            self._refill(state, now)
+            idle = now - state.last_seen
+            if (state.tokens >= self.burst and state.blocked_until <= now
+                    and (state.strikes == 0 or idle > self.max_backoff)):
+                del self._domains[domain]
+
+    def blocked_for(self, url: str) -> float:
+        """Seconds left in the domain's backoff window (0 when not blocked)"""
+        state = self._domains.get(domain_of(url))
+        if state is None:
+            return 0.0
+        return max(0.0, state.blocked_until - self.clock())
+
+    def block_reason(self, url: str) -> Optional[str]:
+        """Why the domain is in backoff: BLOCK_CAPTCHA, BLOCK_NAVIGATION or None"""
+        return self._domains[domain_of(url)].block_reason if self.blocked_for(url) else None
+
+    def retry_after(self, url: str) -> float:
+        """Seconds until the domain's bucket holds a whole token"""
+        state = self._domains.get(domain_of(url))
+        if state is None:
+            return 0.0
+        self._refill(state, self.clock())
+        return 0.0 if state.tokens >= 1 else (1 - state.tokens) / self.rate
+
+    async def acquire(self, url: str, max_wait: float = 30) -> bool:
+        """Take a token for the domain, waiting up to max_wait seconds; False if that is not enough"""
+        state = self._state(url)
+        now = self.clock()
+        state.last_seen = now
+        self._refill(state, now)
+
+        wait = 0.0 if state.tokens >= 1 else (1 - state.tokens) / self.rate
+        if wait > max_wait:
+            return False
+
+        # Reserve the token now so concurrent callers queue behind this one
+        state.tokens -= 1
+        if wait:
+            print(f"⏱️  Rate limit for {domain_of(url)}: waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
+        return True
+
+    def record(self, url: str, captcha_detected: bool = False, navigation_failed: bool = False,
+               latency: Optional[float] = None):
+        """
+        Record an analysis outcome and update the domain's backoff.
+
+        navigation_failed should only be set for failures caused by the site
+        (navigation errors, window closed by the page), not local browser errors.
+        """
+        state = self._state(url)
+        state.last_seen = self.clock()
+        state.outcomes.append({
+            'at': time.time(),
+            'captcha_detected': captcha_detected,
+            'navigation_failed': navigation_failed,
+            'latency': round(latency, 2) if latency is not None else None,
+        })
+
+        state.consecutive_failures = state.consecutive_failures + 1 if navigation_failed else 0
+        if captcha_detected:
+            reason = BLOCK_CAPTCHA
+        elif state.consecutive_failures >= FAILURE_STRIKE_THRESHOLD:
+            reason = BLOCK_NAVIGATION
+        else:
+            reason = None
+
+        if reason:
+            state.strikes += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (state.strikes - 1))
+            state.blocked_until = self.clock() + backoff
+            state.block_reason = reason
+            print(f"🚫 Backing off {domain_of(url)} for {backoff:.0f}s ({reason}, strike {state.strikes})")
+        elif not navigation_failed:
+            state.strikes = 0
+            state.blocked_until = 0.0
+            state.block_reason = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        now = self.clock()
+        result = {}
+        for domain, state in self._domains.items():
+            self._refill(state, now)
+            outcomes = list(state.outcomes)
+            latencies = [o['latency'] for o in outcomes if o['latency'] is not None]
+            blocked_for = max(0.0, state.blocked_until - now)
+            result[domain] = {
+                'blocked_for': round(blocked_for, 1),
+                'block_reason': state.block_reason if blocked_for else None,
+                'strikes': state.strikes,
+                'tokens': round(state.tokens, 2),
+                'recent': len(outcomes),
+                'captcha_detected': sum(o['captcha_detected'] for o in outcomes),
+                'navigation_failed': sum(o['navigation_failed'] for o in outcomes),
+                'avg_latency': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            }
+        return result
@@ -1,19 +1,27 @@
-import requests
-from bs4 import BeautifulSoup
-import ollama
 import json
 import re
-from urllib.parse import urljoin, urlparse
 import time
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from urllib.parse import urljoin, urlparse
+from backends import load
+from session import AnalysisSession, SiteUnreachable
+from models import AuthComponent
+from prompts import PromptBuilder, log_usage
+
+BOT_PROTECTION_MESSAGE = (
+    "🚫 **Site Protected by Anti-Bot Service**\n\n"
+    "This website uses CAPTCHA or anti-bot protection that prevents automated scraping. "
+    "The login page cannot be accessed programmatically.\n\n"
+    "**Alternatives:**\n"
+    "- Use the site's official API if available\n"
+    "- Manually export HTML from your browser\n"
+    "- Test with similar sites that don't have bot protection"
+)
 
 class AuthDetector:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        # The requests session is created on first use so importing this module stays cheap
+        self._session = None
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -25,31 +33,39 @@ class AuthDetector:
             'Sec-Fetch-Mode': 'navigate',
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0'
-        })
+        }
     
-    def detect_auth_components(self, url, use_chromedriver=True):
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = load('requests').Session()
+            self._session.headers.update(self.headers)
+        return self._session
+    
+    def detect_auth_components(self, url, use_chromedriver=True, session=None):
         """
         Detect auth components using undetected-chromedriver
         
         Args:
             url: URL to analyze
             use_chromedriver: If True (default), use undetected-chromedriver to open in browser
+            session: Optional AnalysisSession whose live page is reused and kept open
         """
         if use_chromedriver:
             print(f"🚗 Using undetected-chromedriver to open page in browser...")
-            return self._detect_with_chromedriver(url)
+            return self._detect_with_chromedriver(url, session=session)
         
         # Fallback: simple scraping without ChromeDriver
         try:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
             html_content = response.text
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = load('bs4').BeautifulSoup(html_content, 'html.parser')
             
             components = self._traditional_detection(soup)
             
             if components:
-                ai_analysis = self._ai_analyze_found(html_content, soup)
+                ai_analysis = self._ai_analyze_found(soup, components)
                 return {
                     "url": url,
                     "found": True,
@@ -73,34 +89,26 @@ class AuthDetector:
             }
     
     
-    def _detect_with_chromedriver(self, url):
-        """Use undetected-chromedriver to open page in browser and extract HTML"""
-        driver = None
+    def _detect_with_chromedriver(self, url, session=None):
+        """
+        Use undetected-chromedriver to open page in browser and extract HTML
+
+        When a session is passed, its live page is reused. It is left open for
+        the agent stages only when nothing was found and no CAPTCHA was seen;
+        otherwise it is closed before the LLM call. The caller still closes it.
+        """
+        owns_session = session is None
+        if owns_session:
+            session = AnalysisSession(url)
+        
+        def release(keep_for_agents=False):
+            if owns_session or not keep_for_agents:
+                session.close()
+        
         try:
-            print(f"🚗 Starting undetected-chromedriver for {url}")
-            
-            # Create options for Chrome
-            options = uc.ChromeOptions()
-            # Set to headless=False to see the browser window
-            # options.add_argument('--headless=new')  # Comment this out to see the browser
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--start-maximized')
-            
-            # Initialize undetected chromedriver
-            driver = uc.Chrome(options=options, version_main=None)
-            
-            print(f"📄 Navigating to {url}...")
-            try:
-                driver.get(url)
-            except Exception as nav_err:
-                print(f"❌ Navigation failed: {nav_err}")
-                raise Exception(f"Failed to navigate to URL: {str(nav_err)}")
-            
-            # Wait for page to load
-            print(f"⏳ Waiting for page to load...")
-            time.sleep(5)  # Wait 5 seconds for dynamic content to load
+            if not session.driver:
+                session.open()
+            driver = session.driver
             
             # Check if browser window is still open
             try:
@@ -108,11 +116,14 @@ class AuthDetector:
                 print(f"✅ Browser still active, current URL: {current_url}")
             except Exception as check_err:
                 print(f"⚠️  Browser window closed unexpectedly (likely anti-bot protection): {check_err}")
-                raise Exception("Browser window was closed by the website (anti-bot protection detected)")
+                raise SiteUnreachable("Browser window was closed by the website (anti-bot protection detected)")
             
             # Get the page source immediately (before any waits that might fail)
             try:
-                html_content = driver.page_source
+                snapshot_started = time.perf_counter()
+                html_content = session.snapshot()
+                # Site-side cost only: navigation plus DOM snapshot, not the fixed wait or the LLM call
+                page_load_seconds = (session.load_seconds or 0) + time.perf_counter() - snapshot_started
                 print(f"✅ Got rendered HTML ({len(html_content)} chars)")
             except Exception as html_err:
                 print(f"❌ Failed to get page source: {html_err}")
@@ -120,7 +131,9 @@ class AuthDetector:
             
             # Optional: Wait for specific elements (but don't fail if it errors)
             try:
-                WebDriverWait(driver, 3).until(
+                By = load('selenium.webdriver.common.by').By
+                EC = load('selenium.webdriver.support.expected_conditions')
+                load('selenium.webdriver.support.ui').WebDriverWait(driver, 3).until(
                     EC.presence_of_element_located((By.TAG_NAME, "body"))
                 )
             except Exception as wait_err:
@@ -161,25 +174,18 @@ class AuthDetector:
             
             if captcha_detected and len(html_content) < 3000:
                 print(f"⚠️  Page blocked by anti-bot protection")
-                driver.quit()
+                release()
                 return {
                     "url": url,
+                    "page_load_seconds": page_load_seconds,
                     "found": False,
                     "components": [],
                     "captcha_detected": True,
-                    "ai_analysis": (
-                        "🚫 **Site Protected by Anti-Bot Service**\n\n"
-                        "This website uses CAPTCHA or anti-bot protection that prevents automated scraping. "
-                        "The login page cannot be accessed programmatically.\n\n"
-                        "**Alternatives:**\n"
-                        "- Use the site's official API if available\n"
-                        "- Manually export HTML from your browser\n"
-                        "- Test with similar sites that don't have bot protection"
-                    )
+                    "ai_analysis": BOT_PROTECTION_MESSAGE
                 }
             
             # Now analyze the rendered HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = load('bs4').BeautifulSoup(html_content, 'html.parser')
             
             # Debug: Check if inputs are in HTML before parsing
             raw_username_count = html_content.count('name="username"')
@@ -188,19 +194,15 @@ class AuthDetector:
             
             components = self._traditional_detection(soup)
             
-            # Close the browser safely
-            try:
-                if driver:
-                    driver.quit()
-                    print(f"✅ Browser closed successfully")
-            except Exception as close_err:
-                print(f"⚠️  Browser close warning (browser may have already closed): {close_err}")
+            # Close the browser before the LLM call unless the agents will explore the page
+            release(keep_for_agents=not components and not captcha_detected)
             
             if components:
                 print(f"✅ Found {len(components)} auth components")
-                ai_analysis = self._ai_analyze_found(html_content, soup)
+                ai_analysis = self._ai_analyze_found(soup, components)
                 return {
                     "url": url,
+                    "page_load_seconds": page_load_seconds,
                     "found": True,
                     "components": components,
                     "ai_analysis": f"[ChromeDriver Rendered] {ai_analysis}"
@@ -219,6 +221,7 @@ class AuthDetector:
                 
                 return {
                     "url": url,
+                    "page_load_seconds": page_load_seconds,
                     "found": False,
                     "components": [],
                     "ai_analysis": f"[ChromeDriver Rendered] {ai_analysis}"
@@ -227,45 +230,45 @@ class AuthDetector:
         except Exception as e:
             print(f"❌ ChromeDriver error: {e}")
             # Try to close the browser if it's still open
-            try:
-                if driver:
-                    driver.quit()
-                    print(f"✅ Browser closed after error")
-            except Exception as close_err:
-                print(f"⚠️  Could not close browser (may already be closed): {close_err}")
+            release()
             
             return {
                 "url": url,
                 "found": False,
                 "components": [],
-                "ai_analysis": f"ChromeDriver error: {str(e)}"
+                "ai_analysis": f"ChromeDriver error: {str(e)}",
+                "error": str(e),
+                # Only failures caused by the site count towards its backoff
+                "navigation_failed": isinstance(e, SiteUnreachable)
             }
     
     
+    def _add_component(self, components, seen, element, component_type, method):
+        """Record an auth component, merging strategies that matched the same element"""
+        existing = seen.get(id(element))
+        if existing:
+            existing.add_strategy(method)
+            return
+        component = AuthComponent.from_element(element, component_type, method)
+        seen[id(element)] = component
+        components.append(component)
+    
     def _traditional_detection(self, soup):
         components = []
-        html_source = str(soup)
+        seen = {}
         
         # 1. Traditional HTML forms with password inputs
         password_inputs = soup.find_all('input', {'type': 'password'})
         for pwd_input in password_inputs:
             form = pwd_input.find_parent('form')
             if form:
-                components.append({
-                    'type': 'html_login_form',
-                    'html': str(form),
-                    'method': 'traditional_html'
-                })
+                self._add_component(components, seen, form, 'html_login_form', 'traditional_html')
                 print(f"   ✓ Found HTML form with password input")
         
         # 2. Forms with login/signin classes
         login_forms = soup.find_all('form', {'class': re.compile(r'login|signin|auth', re.I)})
         for form in login_forms:
-            components.append({
-                'type': 'html_login_form',
-                'html': str(form),
-                'method': 'traditional_html'
-            })
+            self._add_component(components, seen, form, 'html_login_form', 'traditional_html')
             print(f"   ✓ Found form with login class")
         
         # 3. Instagram-specific: Look for input elements with name="username" and name="password"
@@ -279,11 +282,7 @@ class AuthDetector:
             for username_input in username_inputs:
                 parent = username_input.find_parent(['form', 'div', 'section'])
                 if parent:
-                    components.append({
-                        'type': 'instagram_style_login',
-                        'html': str(parent),
-                        'method': 'instagram_detection'
-                    })
+                    self._add_component(components, seen, parent, 'instagram_style_login', 'instagram_detection')
                     print(f"   ✓ Found Instagram-style login (username + password inputs)")
                     break
         else:
@@ -299,11 +298,7 @@ class AuthDetector:
                     # Check if there's also a password field nearby
                     password_fields = parent.find_all('input', {'type': 'password'})
                     if password_fields or 'password' in str(parent).lower():
-                        components.append({
-                            'type': 'wordpress_style_login',
-                            'html': str(parent),
-                            'method': 'wordpress_detection'
-                        })
+                        self._add_component(components, seen, parent, 'wordpress_style_login', 'wordpress_detection')
                         print(f"   ✓ Found WordPress-style login (usernameOrEmail field)")
                         break
         
@@ -312,11 +307,7 @@ class AuthDetector:
         for pwd_input in aria_password_inputs:
             parent = pwd_input.find_parent(['form', 'div', 'section'])
             if parent:
-                components.append({
-                    'type': 'aria_labeled_password',
-                    'html': str(parent),
-                    'method': 'aria_label_detection'
-                })
+                self._add_component(components, seen, parent, 'aria_labeled_password', 'aria_label_detection')
                 print(f"   ✓ Found password field with aria-label")
         
         # 6. Detect all input fields and check if there's a combination suggesting login
@@ -334,11 +325,7 @@ class AuthDetector:
                 if inp.get('name', '').lower() in ['username', 'email', 'password']:
                     parent = inp.find_parent(['div', 'section', 'form', 'main'])
                     if parent:
-                        components.append({
-                            'type': 'detected_login_inputs',
-                            'html': str(parent),
-                            'method': 'input_combination_detection'
-                        })
+                        self._add_component(components, seen, parent, 'detected_login_inputs', 'input_combination_detection')
                         print(f"   ✓ Found username + password input combination")
                         break
         
@@ -351,11 +338,7 @@ class AuthDetector:
             if any(keyword in classes for keyword in ['login', 'signin', 'auth', 'form']):
                 inputs = container.find_all(['input', 'div'], {'type': True})
                 if len(inputs) >= 2:  # Likely username + password
-                    components.append({
-                        'type': 'js_auth_container',
-                        'html': str(container),
-                        'method': 'javascript_container'
-                    })
+                    self._add_component(components, seen, container, 'js_auth_container', 'javascript_container')
                     print(f"   ✓ Found JS auth container with {len(inputs)} inputs")
         
         # 8. Data attributes for test/automation (common in React apps)
@@ -363,11 +346,7 @@ class AuthDetector:
         for elem in auth_data_elements:
             parent = elem.find_parent(['div', 'section', 'form'])
             if parent:
-                components.append({
-                    'type': 'data_attr_auth',
-                    'html': str(parent),
-                    'method': 'data_attributes'
-                })
+                self._add_component(components, seen, parent, 'data_attr_auth', 'data_attributes')
                 print(f"   ✓ Found element with auth data-testid")
         
         # 9. Button context - login buttons near inputs
@@ -377,30 +356,29 @@ class AuthDetector:
             if parent:
                 nearby_inputs = parent.find_all(['input'], {'type': True})
                 if len(nearby_inputs) >= 1:
-                    components.append({
-                        'type': 'button_with_inputs',
-                        'html': str(parent),
-                        'method': 'button_context'
-                    })
+                    self._add_component(components, seen, parent, 'button_with_inputs', 'button_context')
                     print(f"   ✓ Found login button with {len(nearby_inputs)} nearby inputs")
         
         print(f"🔍 Detection found: {len(components)} components")
         return components
     
-    def _ai_analyze_found(self, html_content, soup):
+    def _ai_analyze_found(self, soup, components):
         """AI analysis when auth components are found"""
         try:
-            response = ollama.chat(model='llama3.2:latest', messages=[{
-                'role': 'user',
-                'content': f'''Authentication components found! Analyze what type of login system this is:
-
-HTML sample: {html_content[:1500]}
+            prompt = PromptBuilder().components(components).page_signals(soup).build(
+                '''Authentication components found! Analyze what type of login system this is, using the page signals above.
 
 Briefly describe:
 1. Type of authentication (form-based, modal, etc.)
 2. What fields are present
-3. Any special features'''
+3. Any special features''',
+                label="analyze_found"
+            )
+            response = load('ollama').chat(model='llama3.2:latest', messages=[{
+                'role': 'user',
+                'content': prompt
             }])
+            log_usage("analyze_found", response)
             return response['message']['content']
         except:
             return "Auth components detected via traditional parsing"
@@ -408,20 +386,22 @@ Briefly describe:
     def _ai_analyze_not_found(self, soup, suggested_links):
         """AI analysis when no auth components found"""
         try:
-            page_title = soup.find('title')
-            title_text = page_title.get_text() if page_title else "No title"
-            
-            response = ollama.chat(model='llama3.2:latest', messages=[{
-                'role': 'user',
-                'content': f'''No authentication components found on page: "{title_text}"
+            prompt = PromptBuilder().page_signals(soup).build(
+                f'''No authentication components found on this page.
 
 Suggested links checked: {suggested_links}
 
 Briefly explain:
 1. Why this page might not have login forms
 2. What type of page this appears to be
-3. Whether login might be handled differently (JS, modals, etc.)'''
+3. Whether login might be handled differently (JS, modals, etc.)''',
+                label="analyze_not_found"
+            )
+            response = load('ollama').chat(model='llama3.2:latest', messages=[{
+                'role': 'user',
+                'content': prompt
             }])
+            log_usage("analyze_not_found", response)
             return response['message']['content']
         except:
             return f"No auth components found. Checked {len(suggested_links)} suggested links."
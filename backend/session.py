@@ -0,0 +1,138 @@
+import asyncio
+import time
+from backends import load
+
+class SiteUnreachable(Exception):
+    """The site itself failed the page load (navigation error or window closed by the page)"""
+
+class AnalysisSession:
+    """
+    One live browser page shared by every stage of a single analysis.
+
+    The page is opened once with undetected-chromedriver. Static detection reads
+    its rendered DOM, and the agent stages attach Playwright to the same Chrome
+    over CDP instead of launching a fresh browser and reloading the URL.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.driver = None
+        # Seconds spent in driver.get(), excluding the fixed wait afterwards
+        self.load_seconds = None
+        self._playwright = None
+        self._browser = None
+        self._page = None
+
+    def open(self, wait_seconds: int = 5):
+        """Start Chrome, navigate to the URL and wait for dynamic content"""
+        print(f"🚗 Starting undetected-chromedriver for {self.url}")
+
+        uc = load('undetected_chromedriver')
+
+        # Create options for Chrome
+        options = uc.ChromeOptions()
+        # Set to headless=False to see the browser window
+        # options.add_argument('--headless=new')  # Comment this out to see the browser
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--start-maximized')
+
+        # Initialize undetected chromedriver
+        self.driver = uc.Chrome(options=options, version_main=None)
+
+        print(f"📄 Navigating to {self.url}...")
+        try:
+            started = time.perf_counter()
+            self.driver.get(self.url)
+            self.load_seconds = time.perf_counter() - started
+        except Exception as nav_err:
+            print(f"❌ Navigation failed: {nav_err}")
+            raise SiteUnreachable(f"Failed to navigate to URL: {str(nav_err)}")
+
+        # Wait for page to load
+        print(f"⏳ Waiting for page to load...")
+        time.sleep(wait_seconds)
+        return self.driver
+
+    def snapshot(self) -> str:
+        """Capture the rendered DOM of the live page"""
+        return self.driver.page_source
+
+    @property
+    def is_alive(self) -> bool:
+        if not self.driver:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    async def attach_page(self):
+        """Return a Playwright page bound to the already-rendered Chrome tab, or None"""
+        if self._page:
+            return self._page
+
+        try:
+            # WebDriver calls and the first playwright import block, so keep them off the event loop
+            target = await asyncio.to_thread(self._debugger_target)
+            if not target:
+                return None
+            debugger_address, current_url = target
+
+            playwright_api = await asyncio.to_thread(load, 'playwright.async_api')
+            self._playwright = await playwright_api.async_playwright().start()
+            self._browser = await self._playwright.chromium.connect_over_cdp(f"http://{debugger_address}")
+
+            pages = [page for context in self._browser.contexts for page in context.pages]
+            self._page = next((page for page in pages if page.url == current_url), pages[0] if pages else None)
+
+            if self._page:
+                print(f"🔗 Attached Playwright to live page: {self._page.url}")
+            return self._page
+
+        except Exception as e:
+            print(f"⚠️  Could not attach Playwright to live browser: {e}")
+            await self._detach_page()
+            return None
+
+    def _debugger_target(self):
+        """(CDP address, current URL) of the live browser, or None"""
+        if not self.is_alive:
+            return None
+        debugger_address = self.driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        if not debugger_address:
+            debugger_address = getattr(self.driver.options, 'debugger_address', None)
+        if not debugger_address:
+            return None
+        return debugger_address, self.driver.current_url
+
+    async def _detach_page(self):
+        self._page = None
+        try:
+            if self._browser:
+                await self._browser.close()
+            if self._playwright:
+                await self._playwright.stop()
+        except Exception as e:
+            print(f"⚠️  Playwright detach warning: {e}")
+        finally:
+            self._browser = None
+            self._playwright = None
+
+    def close(self):
+        """Quit the browser, tolerating a window the site already closed"""
+        try:
+            if self.driver:
+                self.driver.quit()
+                print(f"✅ Browser closed successfully")
+        except Exception as close_err:
+            print(f"⚠️  Browser close warning (browser may have already closed): {close_err}")
+        finally:
+            self.driver = None
+
+    async def aclose(self):
+        """Detach Playwright (if attached) and quit the browser"""
+        await self._detach_page()
+        await asyncio.to_thread(self.close)
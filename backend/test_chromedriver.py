@@ -36,9 +36,12 @@ def test_basic_detection():
             print("\n📝 Detected Components:")
             for i, component in enumerate(result['components'], 1):
                 print(f"\n   Component {i}:")
-                print(f"   - Type: {component['type']}")
-                print(f"   - Method: {component['method']}")
-                html_preview = component['html'][:200] + "..." if len(component['html']) > 200 else component['html']
+                print(f"   - Type: {component.type}")
+                print(f"   - Strategies: {', '.join(component.strategies)}")
+                print(f"   - CSS Path: {component.css_path}")
+                print(f"   - Fields: {component.fields}")
+                print(f"   - Buttons: {component.buttons}")
+                html_preview = component.html[:200] + "..." if len(component.html) > 200 else component.html
                 print(f"   - HTML Preview: {html_preview}")
         
         if result.get('ai_analysis'):
@@ -0,0 +1,73 @@
+import pytest
+from models import (
+    AuthComponent, HTML_EXCERPT_CHARS, css_path, field_inventory, button_labels, element_excerpt, html_excerpt
+)
+
+bs4 = pytest.importorskip('bs4')
+
+
+def parse(html):
+    return bs4.BeautifulSoup(html, 'html.parser')
+
+
+def test_field_inventory_skips_hidden_and_buttons():
+    soup = parse('''<form>
+        <input type="hidden" name="csrf">
+        <input name="user" autocomplete="username">
+        <input type="password" name="pass">
+        <select name="region"></select>
+        <input type="submit" value="Go">
+    </form>''')
+    assert field_inventory(soup) == [
+        {'type': 'text', 'name': 'user', 'autocomplete': 'username'},
+        {'type': 'password', 'name': 'pass'},
+        {'type': 'select', 'name': 'region'},
+    ]
+
+
+def test_button_labels_are_deduplicated():
+    soup = parse('''<div>
+        <button>Log in</button>
+        <input type="submit" value="Log in">
+        <div role="button" aria-label="Show password"></div>
+        <input type="text" value="ignored">
+    </div>''')
+    assert button_labels(soup) == ['Log in', 'Show password']
+
+
+def test_css_path_stops_at_id_and_numbers_siblings():
+    soup = parse('<div id="app"><main><form></form><form><input name="x"></form></main></div>')
+    field = soup.find('input')
+    assert css_path(field) == 'div#app > main > form:nth-of-type(2) > input'
+
+
+def test_css_path_without_id_reaches_root():
+    soup = parse('<body><section><p></p></section></body>')
+    assert css_path(soup.find('p')) == 'body > section > p'
+
+
+def test_component_keeps_only_a_short_excerpt():
+    soup = parse('<form>' + 'x' * 1000 + '<input type="password" name="p"><button>Go</button></form>')
+    component = AuthComponent.from_element(soup.find('form'), 'html_login_form', 'traditional_html')
+    component.add_strategy('button_context')
+    component.add_strategy('traditional_html')
+
+    assert len(component.html) == HTML_EXCERPT_CHARS + 3
+    assert component.fields == [{'type': 'password', 'name': 'p'}]
+    assert component.buttons == ['Go']
+    assert component.strategies == ['traditional_html', 'button_context']
+    assert 'html' not in component.inventory()
+    assert component.to_dict()['method'] == 'traditional_html'
+
+
+def test_element_excerpt_matches_bs4_serialization():
+    soup = parse('''<div class="a b" data-x='say "hi"'><!-- note -->
+        <form action="/s?a=1&amp;b=2"><input name="u" disabled><br><p>Tom &amp; Jerry</p></form></div>''')
+    assert element_excerpt(soup.div) == str(soup.div)
+
+
+def test_element_excerpt_stops_at_limit():
+    soup = parse('<main class="auth-form">' + '<div><span>hello</span></div>' * 5000 + '</main>')
+    excerpt = element_excerpt(soup.main)
+    assert excerpt == html_excerpt(str(soup.main))
+    assert len(excerpt) == HTML_EXCERPT_CHARS + 3
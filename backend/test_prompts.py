@@ -0,0 +1,69 @@
+import pytest
+from prompts import PromptBuilder, estimate_tokens, visible_text
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('abcd') == 1
+    assert estimate_tokens('abcde') == 2
+
+
+def test_build_keeps_everything_within_budget():
+    prompt = PromptBuilder(token_budget=100).section("Forms", ["form: fields [password]"]).build("Describe it.")
+    assert prompt == "Forms:\n- form: fields [password]\n\nDescribe it."
+
+
+def test_build_drops_lines_past_budget_and_counts_them():
+    builder = PromptBuilder(token_budget=6)
+    builder.section("First", ["a" * 8, "b" * 8])  # 3 tokens each, both fit
+    builder.section("Second", ["c" * 8, "d"])     # budget spent: both dropped
+    prompt = builder.build("Go.")
+    assert "- aaaaaaaa\n- bbbbbbbb" in prompt
+    assert "Second" not in prompt
+    assert "(2 lower-priority items omitted to fit the token budget)" in prompt
+
+
+def test_build_skips_long_line_but_keeps_later_short_ones():
+    builder = PromptBuilder(token_budget=5)
+    builder.section("Forms", ["x" * 40]).section("Buttons", ["Sign in"])
+    prompt = builder.build("Go.")
+    assert "x" * 40 not in prompt
+    assert "Buttons:\n- Sign in" in prompt
+    assert "(1 lower-priority items omitted" in prompt
+
+
+def test_build_without_sections():
+    prompt = PromptBuilder().section("Empty", ["", None]).build("Go.")
+    assert prompt == "No auth-related elements extracted.\n\nGo."
+
+
+def test_page_signals_extracts_auth_signal_and_ignores_scripts():
+    bs4 = pytest.importorskip('bs4')
+    soup = bs4.BeautifulSoup('''
+        <html><head><title>Sign in</title><script>var login = "password"</script></head><body>
+        <svg><text>Log in</text></svg>
+        <form action="/session" method="post">
+          <label>Email address</label>
+          <input name="login" autocomplete="username">
+          <input type="password" name="password">
+          <input type="submit" value="Sign in">
+        </form>
+        <a href="https://accounts.google.com/o/oauth2/auth">Continue with Google</a>
+        <div class="g-recaptcha"></div>
+        </body></html>''', 'html.parser')
+    prompt = PromptBuilder().page_signals(soup).build("Go.")
+    assert "Page title:\n- Sign in" in prompt
+    assert "CAPTCHA markers:\n- recaptcha" in prompt
+    assert ("form action=/session method=post: fields "
+            "[text(name=login, autocomplete=username), password(name=password)]; buttons [Sign in]") in prompt
+    assert "Continue with Google -> https://accounts.google.com/o/oauth2/auth" in prompt
+    assert "Email address" in prompt
+    assert "var login" not in prompt
+    assert "Log in" not in prompt
+
+
+def test_visible_text_skips_comments():
+    bs4 = pytest.importorskip('bs4')
+    soup = bs4.BeautifulSoup('<a href="/"><!-- login --> Home <![CDATA[sign in]]></a>', 'html.parser')
+    assert visible_text(soup.a) == "Home"
+    assert "Auth buttons" not in PromptBuilder().page_signals(soup).build("Go.")
@@ -0,0 +1,114 @@
+import asyncio
+import scheduler
+from scheduler import DomainScheduler, BLOCK_CAPTCHA, BLOCK_NAVIGATION, domain_of
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(**kwargs):
+    clock = FakeClock()
+    return DomainScheduler(clock=clock, **kwargs), clock
+
+
+def acquire(sched, url, max_wait=0):
+    return asyncio.run(sched.acquire(url, max_wait=max_wait))
+
+
+def test_domain_of_strips_www_and_path():
+    assert domain_of('https://www.Example.com/login?x=1') == 'example.com'
+
+
+def test_bucket_allows_burst_then_refuses():
+    sched, _ = make_scheduler(rate_per_minute=6, burst=3)
+    assert [acquire(sched, 'https://a.com') for _ in range(3)] == [True, True, True]
+    assert acquire(sched, 'https://a.com') is False
+    assert sched.retry_after('https://a.com') == 10
+
+
+def test_bucket_refills_over_time():
+    sched, clock = make_scheduler(rate_per_minute=6, burst=3)
+    for _ in range(3):
+        acquire(sched, 'https://a.com')
+    clock.now += 10
+    assert acquire(sched, 'https://a.com') is True
+    assert acquire(sched, 'https://a.com') is False
+
+
+def test_buckets_are_per_domain():
+    sched, _ = make_scheduler(burst=1)
+    assert acquire(sched, 'https://a.com') is True
+    assert acquire(sched, 'https://b.com') is True
+    assert acquire(sched, 'https://a.com') is False
+
+
+def test_captcha_backoff_doubles_and_resets():
+    sched, clock = make_scheduler()
+    sched.record('https://a.com', captcha_detected=True)
+    assert sched.blocked_for('https://a.com') == 60
+    assert sched.block_reason('https://a.com') == BLOCK_CAPTCHA
+
+    clock.now += 60
+    assert sched.blocked_for('https://a.com') == 0
+    sched.record('https://a.com', captcha_detected=True)
+    assert sched.blocked_for('https://a.com') == 120
+
+    clock.now += 120
+    sched.record('https://a.com')
+    assert sched.blocked_for('https://a.com') == 0
+    sched.record('https://a.com', captcha_detected=True)
+    assert sched.blocked_for('https://a.com') == 60
+
+
+def test_backoff_is_capped():
+    sched, _ = make_scheduler(base_backoff=60, max_backoff=100)
+    sched.record('https://a.com', captcha_detected=True)
+    sched.record('https://a.com', captcha_detected=True)
+    assert sched.blocked_for('https://a.com') == 100
+
+
+def test_navigation_backoff_needs_consecutive_failures():
+    sched, _ = make_scheduler()
+    sched.record('https://a.com', navigation_failed=True)
+    assert sched.blocked_for('https://a.com') == 0
+    sched.record('https://a.com')
+    sched.record('https://a.com', navigation_failed=True)
+    assert sched.blocked_for('https://a.com') == 0
+    sched.record('https://a.com', navigation_failed=True)
+    assert sched.blocked_for('https://a.com') == 60
+    assert sched.block_reason('https://a.com') == BLOCK_NAVIGATION
+
+
+def test_blocked_for_does_not_create_state():
+    sched, _ = make_scheduler()
+    assert sched.blocked_for('https://unseen.com') == 0
+    assert sched.block_reason('https://unseen.com') is None
+    assert sched.stats() == {}
+
+
+def test_idle_domains_are_pruned(monkeypatch):
+    monkeypatch.setattr(scheduler, 'PRUNE_THRESHOLD', 3)
+    sched, clock = make_scheduler()
+    for name in ('a', 'b', 'c'):
+        acquire(sched, f'https://{name}.com')
+    sched.record('https://c.com', captcha_detected=True)
+
+    # Buckets are full again, but c.com is still in backoff
+    clock.now += 30
+    acquire(sched, 'https://d.com')
+    assert set(sched.stats()) == {'c.com', 'd.com'}
+
+
+def test_stats_summarise_outcomes():
+    sched, _ = make_scheduler()
+    sched.record('https://a.com', latency=2.0)
+    sched.record('https://a.com', navigation_failed=True, latency=4.0)
+    stats = sched.stats()['a.com']
+    assert stats['recent'] == 2
+    assert stats['navigation_failed'] == 1
+    assert stats['avg_latency'] == 3.0
@@ -10,6 +10,12 @@ const api = axios.create({
   timeout: 60000, // 60 seconds timeout for slower websites
 });
 
+// Match a field from the backend's inventory by type, name or autocomplete hint
+const isField = (field, kind) =>
+  field.type === kind ||
+  field.name?.toLowerCase().includes(kind) ||
+  field.autocomplete?.toLowerCase().includes(kind);
+
 export const analyzeUrl = async (url) => {
   try {
     // Ensure URL has protocol
@@ -38,22 +44,18 @@ export const analyzeUrl = async (url) => {
           backendData.components?.some(
             (c) =>
               c.type.includes("password") ||
-              c.html?.toLowerCase().includes("password")
+              c.fields?.some((f) => f.type === "password")
           ) || false,
         has_email_field:
           backendData.components?.some((c) =>
-            c.html?.toLowerCase().includes("email")
+            c.fields?.some((f) => isField(f, "email"))
           ) || false,
         has_username_field:
           backendData.components?.some((c) =>
-            c.html?.toLowerCase().includes("username")
+            c.fields?.some((f) => isField(f, "username") || isField(f, "user"))
           ) || false,
         has_submit_button:
-          backendData.components?.some(
-            (c) =>
-              c.html?.toLowerCase().includes("submit") ||
-              c.html?.toLowerCase().includes("button")
-          ) || false,
+          backendData.components?.some((c) => c.buttons?.length > 0) || false,
       },
       confidence: backendData.found ? "high" : "low",
       analyzed_at: new Date().toLocaleString(),
@@ -61,7 +63,11 @@ export const analyzeUrl = async (url) => {
     };
   } catch (error) {
     if (error.response) {
-      throw new Error(error.response.data.error || "Failed to analyze URL");
+      throw new Error(
+        error.response.data.error ||
+          error.response.data.detail ||
+          "Failed to analyze URL"
+      );
     } else if (error.request) {
       throw new Error(
         "No response from server. Please check if the backend is running."